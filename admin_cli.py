@@ -0,0 +1,143 @@
+import argparse
+import json
+import sys
+
+import psycopg
+
+from db import DB_URI
+
+# ==============================================================================
+# Admin export / inspection CLI for the store and checkpoint tables.
+# Rows are streamed (server-side cursor for JSONL, COPY for CSV), so memory
+# stays flat no matter how big the tables get.
+#
+#   python admin_cli.py store --user dani --since 2026-01-01 > store.jsonl
+#   python admin_cli.py checkpoints --thread T1 --format csv --out cps.csv
+#   python admin_cli.py threads
+# ==============================================================================
+
+FETCH_SIZE = 2000
+
+# Checkpoints have no timestamp column; the checkpoint JSON carries it as "ts"
+CHECKPOINT_TS = "(checkpoint->>'ts')::timestamptz"
+
+def _store_query(args):
+    where, params = [], []
+    if args.user:
+        # Namespaces are stored dot-joined ('user.<id>.<kind>') and ids may contain
+        # dots, so match the whole 'user.<id>.' head and a dot-free kind after it
+        where.append("""(prefix = 'user.' || %s OR (
+            left(prefix, length(%s) + 6) = 'user.' || %s || '.'
+            AND strpos(substr(prefix, length(%s) + 7), '.') = 0))""")
+        params.extend([args.user] * 4)
+    if args.since:
+        where.append("updated_at >= %s")
+        params.append(args.since)
+    if args.until:
+        where.append("updated_at < %s")
+        params.append(args.until)
+    sql = "SELECT prefix, key, value, created_at, updated_at FROM store"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY prefix, key", params
+
+def _checkpoint_filters(args):
+    where, params = [], []
+    if args.user:
+        where.append("metadata->>'user_id' = %s")
+        params.append(args.user)
+    if args.thread:
+        where.append("thread_id = %s")
+        params.append(args.thread)
+    if args.since:
+        where.append(f"{CHECKPOINT_TS} >= %s")
+        params.append(args.since)
+    if args.until:
+        where.append(f"{CHECKPOINT_TS} < %s")
+        params.append(args.until)
+    return (" WHERE " + " AND ".join(where) if where else ""), params
+
+def _checkpoints_query(args):
+    where, params = _checkpoint_filters(args)
+    sql = f"""
+        SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+               {CHECKPOINT_TS} AS ts, metadata
+        FROM checkpoints{where}
+        ORDER BY thread_id, checkpoint_ns, checkpoint_id"""
+    return sql, params
+
+def _threads_query(args):
+    # One GROUP BY instead of a query per thread
+    where, params = _checkpoint_filters(args)
+    sql = f"""
+        SELECT thread_id, COUNT(*) AS checkpoint_count,
+               MIN({CHECKPOINT_TS}) AS first_ts, MAX({CHECKPOINT_TS}) AS last_ts
+        FROM checkpoints{where}
+        GROUP BY thread_id
+        ORDER BY last_ts DESC"""
+    return sql, params
+
+QUERIES = {
+    "store": _store_query,
+    "checkpoints": _checkpoints_query,
+    "threads": _threads_query,
+}
+
+def iter_rows(sql, params, conn):
+    """Yield rows as dicts through a named (server-side) cursor, FETCH_SIZE at a time"""
+    with conn.cursor(name="admin_export") as cur:
+        cur.itersize = FETCH_SIZE
+        cur.execute(sql, params)
+        columns = None
+        for row in cur:
+            if columns is None:
+                columns = [c.name for c in cur.description]
+            yield dict(zip(columns, row))
+
+def export_jsonl(sql, params, conn, out):
+    count = 0
+    for row in iter_rows(sql, params, conn):
+        out.write(json.dumps(row, default=str, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+def export_csv(sql, params, conn, out):
+    # COPY streams straight from the server; nothing is materialized client side
+    size = 0
+    with conn.cursor() as cur:
+        with cur.copy(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true)", params) as copy:
+            for data in copy:
+                out.write(bytes(data).decode("utf-8"))
+                size += len(data)
+    return size
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream store rows and checkpoint metadata as JSONL or CSV")
+    parser.add_argument("table", choices=QUERIES.keys())
+    parser.add_argument("--user", help="user id, e.g. 'dani' for the ('user', 'dani', ...) namespace")
+    parser.add_argument("--thread", help="thread id (checkpoints/threads only)")
+    parser.add_argument("--since", help="ISO date/time, inclusive")
+    parser.add_argument("--until", help="ISO date/time, exclusive")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--out", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.thread and args.table == "store":
+        parser.error("--thread does not apply to the store table")
+
+    sql, params = QUERIES[args.table](args)
+    out = open(args.out, "w", encoding="utf-8", newline="") if args.out else sys.stdout
+    try:
+        with psycopg.connect(DB_URI) as conn:
+            if args.format == "csv":
+                size = export_csv(sql, params, conn, out)
+                print(f"✅ Exported {size} bytes of {args.table}", file=sys.stderr)
+            else:
+                count = export_jsonl(sql, params, conn, out)
+                print(f"✅ Exported {count} {args.table} rows", file=sys.stderr)
+    finally:
+        if args.out:
+            out.close()
+
+if __name__ == '__main__':
+    main()
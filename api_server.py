@@ -0,0 +1,265 @@
+import asyncio
+import hmac
+import json
+import os
+import sys
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import uvicorn
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from langgraph.store.postgres.aio import AsyncPostgresStore
+from langgraph.types import Command
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from pydantic import BaseModel
+
+import resume_profile
+from db import DB_URI
+from main import get_builder
+from compact_serde import COMPACT_CHECKPOINTS, CompactSerializer, PostgresPayloadStore
+
+# ==============================================================================
+# Async HTTP API for the headhunter graph. One compiled graph per process,
+# sharing a pooled Postgres checkpointer and store across all clients.
+#
+#   python api_server.py            (or: uvicorn api_server:app)
+#
+# Every request names its user with the X-User-Id header. The API does not
+# authenticate that header itself: it listens on localhost only, and must sit
+# behind an authenticating proxy that sets X-User-Id from the logged-in user
+# (dropping any value the client sent). Setting API_TOKEN additionally requires
+# "Authorization: Bearer <API_TOKEN>", which that proxy should add.
+# ==============================================================================
+
+if sys.platform == "win32":
+    # psycopg's async mode needs the selector loop on Windows
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+# Many users share this process: never fall back to the local resume.txt
+resume_profile.ALLOW_DEFAULT_RESUME = False
+
+HOST = os.getenv("API_HOST", "127.0.0.1")
+API_TOKEN = os.getenv("API_TOKEN")
+PORT = 8000
+POOL_MIN_SIZE = 2
+POOL_MAX_SIZE = 20
+MAX_CONCURRENT_RUNS = 32       # graph runs in flight across all users
+PER_USER_CONCURRENCY = 2       # graph runs in flight per user
+QUEUE_TIMEOUT_SECONDS = 5      # wait for a global slot before answering 503
+
+class MessageRequest(BaseModel):
+    message: str
+
+class ResumeRequest(BaseModel):
+    decision: str
+
+class ThreadedAsyncPostgresSaver(AsyncPostgresSaver):
+    """
+    AsyncPostgresSaver that decodes channel blobs in a worker thread. The stock
+    saver runs serde.loads_typed on the event loop, and CompactSerializer may
+    fetch an offloaded payload from Postgres with a blocking query.
+    """
+
+    async def _load_checkpoint_tuple(self, value):
+        blobs = await asyncio.to_thread(self._load_blobs, value["channel_values"])
+        checkpoint_tuple = await super()._load_checkpoint_tuple({**value, "channel_values": None})
+        checkpoint_tuple.checkpoint["channel_values"].update(blobs)
+        return checkpoint_tuple
+
+class RunLimiter:
+    """Backpressure: bounded global runs, per-user caps, one run per thread at a time"""
+
+    def __init__(self):
+        self.slots = asyncio.Semaphore(MAX_CONCURRENT_RUNS)
+        self.user_runs = defaultdict(int)
+        self.busy_threads = set()
+
+    async def acquire(self, user_id: str, thread_id: str):
+        if self.user_runs[user_id] >= PER_USER_CONCURRENCY:
+            raise HTTPException(429, f"Too many concurrent requests for user '{user_id}'", headers={"Retry-After": "2"})
+        if thread_id in self.busy_threads:
+            raise HTTPException(409, f"Thread '{thread_id}' is already running")
+        self.user_runs[user_id] += 1
+        self.busy_threads.add(thread_id)
+        try:
+            await asyncio.wait_for(self.slots.acquire(), QUEUE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            self._forget(user_id, thread_id)
+            raise HTTPException(503, "Server busy, retry later", headers={"Retry-After": "5"})
+
+    def release(self, user_id: str, thread_id: str):
+        self.slots.release()
+        self._forget(user_id, thread_id)
+
+    def _forget(self, user_id, thread_id):
+        self.user_runs[user_id] -= 1
+        if self.user_runs[user_id] <= 0:
+            del self.user_runs[user_id]
+        self.busy_threads.discard(thread_id)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with AsyncConnectionPool(
+        DB_URI, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, open=False,
+        kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+    ) as pool:
+        # Always able to read compacted blobs; the flag only decides how new ones are written
+        payloads = PostgresPayloadStore(DB_URI)
+        if COMPACT_CHECKPOINTS:
+            payloads.setup()
+        checkpointer = ThreadedAsyncPostgresSaver(pool, serde=CompactSerializer(payloads, compact=COMPACT_CHECKPOINTS))
+        store = AsyncPostgresStore(pool)
+        await checkpointer.setup()
+        await store.setup()
+
+        app.state.pool = pool
+        app.state.graph = get_builder().compile(store=store, checkpointer=checkpointer)
+        app.state.limiter = RunLimiter()
+        print("🤖 HEADHUNTER API READY!")
+        try:
+            yield
+        finally:
+            if payloads.conn is not None:
+                payloads.conn.close()
+
+app = FastAPI(title="Agent HeadHunter API", lifespan=lifespan)
+
+# ------------------- Helpers -------------------
+
+async def require_token(authorization: Optional[str] = Header(None)):
+    """Shared-secret check between the proxy and this API, when API_TOKEN is set"""
+    if API_TOKEN and not hmac.compare_digest(authorization or "", f"Bearer {API_TOKEN}"):
+        raise HTTPException(401, "Missing or invalid API token")
+
+def _config(user_id: str, thread_id: str):
+    return {"configurable": {"user_id": user_id, "thread_id": thread_id}}
+
+async def _turn_result(graph, config):
+    """Final reply of a turn, or the pending interrupt (payment approval)"""
+    snapshot = await graph.aget_state(config)
+    if snapshot.next and snapshot.tasks and snapshot.tasks[0].interrupts:
+        return {"interrupt": snapshot.tasks[0].interrupts[0].value}
+    messages = snapshot.values.get("messages", [])
+    return {"reply": messages[-1].content if messages else ""}
+
+async def _check_owner(user_id: str, thread_id: str):
+    """404 unless the thread is new or every checkpoint of it was written by user_id"""
+    async with app.state.pool.connection() as conn:
+        cur = await conn.execute("""
+            SELECT 1 FROM checkpoints
+            WHERE thread_id = %s AND checkpoint_ns = ''
+            AND metadata->>'user_id' IS DISTINCT FROM %s
+            LIMIT 1
+        """, (thread_id, user_id))
+        if await cur.fetchone():
+            # Same answer as a missing thread, so ids of other users' threads don't leak
+            raise HTTPException(404, f"Thread '{thread_id}' not found")
+
+async def _run(user_id: str, thread_id: str, command):
+    await _check_owner(user_id, thread_id)
+    limiter = app.state.limiter
+    await limiter.acquire(user_id, thread_id)
+    try:
+        config = _config(user_id, thread_id)
+        await app.state.graph.ainvoke(command, config)
+        return await _turn_result(app.state.graph, config)
+    finally:
+        limiter.release(user_id, thread_id)
+
+def _sse(event: str, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+# ------------------- Endpoints -------------------
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.post("/threads/{thread_id}/messages", dependencies=[Depends(require_token)])
+async def send_message(thread_id: str, body: MessageRequest, x_user_id: str = Header(...)):
+    return await _run(x_user_id, thread_id, {"messages": [HumanMessage(content=body.message)]})
+
+@app.post("/threads/{thread_id}/resume", dependencies=[Depends(require_token)])
+async def resume(thread_id: str, body: ResumeRequest, x_user_id: str = Header(...)):
+    """Answer the payment approval interrupt, e.g. {"decision": "yes"}"""
+    return await _run(x_user_id, thread_id, Command(resume=body.decision))
+
+@app.get("/threads", dependencies=[Depends(require_token)])
+async def list_threads(x_user_id: str = Header(...), limit: int = 50):
+    async with app.state.pool.connection() as conn:
+        cur = await conn.execute("""
+            SELECT thread_id, COUNT(*) AS checkpoint_count,
+                   MAX((checkpoint->>'ts')::timestamptz) AS last_ts
+            FROM checkpoints
+            WHERE checkpoint_ns = '' AND metadata->>'user_id' = %s
+            GROUP BY thread_id
+            ORDER BY last_ts DESC
+            LIMIT %s
+        """, (x_user_id, limit))
+        return await cur.fetchall()
+
+@app.post("/threads/{thread_id}/stream", dependencies=[Depends(require_token)])
+async def stream(thread_id: str, body: Optional[MessageRequest] = None, x_user_id: str = Header(...),
+                 resume: Optional[str] = None):
+    """
+    Server-sent events for one turn: `token` (chat_node output), `interrupt`,
+    then `done` with the same payload as /messages. Pass ?resume=yes to answer
+    an interrupt instead of sending a message.
+    """
+    if resume is not None:
+        command = Command(resume=resume)
+    elif body is not None:
+        command = {"messages": [HumanMessage(content=body.message)]}
+    else:
+        raise HTTPException(422, "Send a message body or ?resume=<decision>")
+
+    await _check_owner(x_user_id, thread_id)
+    limiter = app.state.limiter
+    await limiter.acquire(x_user_id, thread_id)
+    graph = app.state.graph
+    config = _config(x_user_id, thread_id)
+    released = False
+
+    def release_once():
+        # Called from the generator and as a background task, in case the client
+        # went away before the stream ever started
+        nonlocal released
+        if not released:
+            released = True
+            limiter.release(x_user_id, thread_id)
+
+    async def events():
+        # The generator only advances as fast as the client reads, so slow
+        # clients slow their own run instead of buffering tokens in memory.
+        step, stream_id = None, None
+        try:
+            async for mode, payload in graph.astream(command, config, stream_mode=["messages", "updates"]):
+                if mode == "messages":
+                    chunk, metadata = payload
+                    if metadata.get("langgraph_node") != "chat_node" or not isinstance(chunk.content, str) or not chunk.content:
+                        continue
+                    # First reply per graph step only, so a hedged duplicate from
+                    # the fallback provider never interleaves with it
+                    if metadata.get("langgraph_step") != step:
+                        step, stream_id = metadata.get("langgraph_step"), chunk.id
+                    if chunk.id == stream_id:
+                        yield _sse("token", {"id": chunk.id, "text": chunk.content})
+                elif "__interrupt__" in payload:
+                    yield _sse("interrupt", {"value": payload["__interrupt__"][0].value})
+            yield _sse("done", await _turn_result(graph, config))
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            release_once()
+
+    return StreamingResponse(events(), media_type="text/event-stream", background=BackgroundTask(release_once),
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+if __name__ == '__main__':
+    uvicorn.run(app, host=HOST, port=PORT)
@@ -0,0 +1,46 @@
+import statistics
+import subprocess
+import sys
+
+# ==============================================================================
+# Cold-start benchmark: each target is imported in a fresh interpreter so module
+# caches don't hide the cost. Run: python bench_import.py [runs]
+# ==============================================================================
+
+TARGETS = {
+    "db helpers": "import db",
+    "main (lazy)": "import main",
+    "main + graph": "import main; main.get_builder()",
+    "main + graph + tools": "import main; main.get_builder(); main.get_tools()",
+}
+
+SNIPPET = """
+import time
+t = time.perf_counter()
+{stmt}
+print(time.perf_counter() - t)
+"""
+
+def measure(stmt: str, runs: int):
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", SNIPPET.format(stmt=stmt)],
+                             capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(out.stderr.strip().splitlines()[-1])
+        times.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+    return times
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"⏱️  Import time over {runs} cold runs (ms)\n")
+    for name, stmt in TARGETS.items():
+        try:
+            times = measure(stmt, runs)
+        except RuntimeError as e:
+            print(f"{name:<24} ⚠️ {e}")
+            continue
+        print(f"{name:<24} median {statistics.median(times):8.1f}   min {min(times):8.1f}   max {max(times):8.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import psycopg
+from langchain_core.messages import BaseMessage, ToolMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from db import DB_URI
+
+try:
+    import zstandard
+except ImportError:  # zlib is always there, just slower and bigger
+    zstandard = None
+
+# ==============================================================================
+# Compact checkpoint serializer. It is always installed so compacted blobs stay
+# readable; COMPACT_CHECKPOINTS=1 only turns on compression/offload for writes.
+# - Payloads above COMPRESS_MIN_BYTES are compressed (zstd, or zlib fallback)
+#   and tagged "<type>+zstd" / "<type>+zlib"; untagged blobs load as before.
+# - Tool messages above OFFLOAD_MIN_CHARS (e.g. the good jobs report) are
+#   stored once in `checkpoint_payloads`, keyed by sha256, and every blob
+#   version only carries the reference.
+# ==============================================================================
+
+COMPACT_CHECKPOINTS = os.getenv("COMPACT_CHECKPOINTS", "0") == "1"
+COMPRESS_MIN_BYTES = 1024
+OFFLOAD_MIN_CHARS = 4096
+PAYLOAD_REF_PREFIX = "payload-ref:sha256:"
+PAYLOAD_CACHE_SIZE = 256
+# Re-touch last_used_at of a cached payload at most this often; retention.py only
+# collects unreferenced payloads unused for much longer than this
+PAYLOAD_TOUCH_SECONDS = 3600
+PAYLOAD_REF_RE = re.compile(rb"payload-ref:sha256:([0-9a-f]{64})")
+
+def ensure_payload_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS checkpoint_payloads (
+            hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            data BYTEA NOT NULL,
+            created_at TIMESTAMPTZ DEFAULT now()
+        );
+    """)
+    conn.execute("ALTER TABLE checkpoint_payloads ADD COLUMN IF NOT EXISTS last_used_at TIMESTAMPTZ DEFAULT now()")
+
+class PostgresPayloadStore:
+    """Content-addressed side storage for large message bodies"""
+
+    def __init__(self, conn_string: str = DB_URI):
+        self.conn_string = conn_string
+        self.conn = None
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+
+    def _connection(self):
+        if self.conn is None or self.conn.closed:
+            self.conn = psycopg.connect(self.conn_string, autocommit=True)
+        return self.conn
+
+    def setup(self):
+        with self.lock:
+            ensure_payload_table(self._connection())
+
+    def _remember(self, digest, text, touched=None):
+        # touched: monotonic time this process last bumped last_used_at, None if never
+        self.cache[digest] = (text, touched)
+        self.cache.move_to_end(digest)
+        while len(self.cache) > PAYLOAD_CACHE_SIZE:
+            self.cache.popitem(last=False)
+
+    def put(self, text: str):
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self.lock:
+            touched = self.cache[digest][1] if digest in self.cache else None
+            if touched is None or time.monotonic() - touched > PAYLOAD_TOUCH_SECONDS:
+                codec, packed = _compress(text.encode("utf-8"))
+                self._connection().execute("""
+                    INSERT INTO checkpoint_payloads (hash, codec, data) VALUES (%s, %s, %s)
+                    ON CONFLICT (hash) DO UPDATE SET last_used_at = now()
+                """, (digest, codec, packed))
+                touched = time.monotonic()
+            self._remember(digest, text, touched)
+        return digest
+
+    def get(self, digest: str):
+        with self.lock:
+            if digest in self.cache:
+                self.cache.move_to_end(digest)
+                return self.cache[digest][0]
+            row = self._connection().execute(
+                "SELECT codec, data FROM checkpoint_payloads WHERE hash = %s", (digest,)
+            ).fetchone()
+            if row is None:
+                return None
+            text = _decompress(row[0], bytes(row[1])).decode("utf-8")
+            self._remember(digest, text)
+            return text
+
+def payload_refs(type_: str, blob: bytes):
+    """Payload hashes referenced by one stored blob (compressed or not)"""
+    if "+" in type_:
+        blob = _decompress(type_.rsplit("+", 1)[1], blob)
+    return {m.decode() for m in PAYLOAD_REF_RE.findall(blob)}
+
+def _compress(data: bytes):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+def _decompress(codec: str, data: bytes):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Blob is zstd-compressed but the 'zstandard' package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+class CompactSerializer(JsonPlusSerializer):
+    def __init__(self, payloads: PostgresPayloadStore = None, compact: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self.payloads = payloads
+        # False: write plain blobs like the stock serializer, still read compacted ones
+        self.compact = compact
+
+    # ------------- message offloading -------------
+    def _offload(self, obj):
+        if isinstance(obj, ToolMessage) and isinstance(obj.content, str) and len(obj.content) >= OFFLOAD_MIN_CHARS:
+            return obj.model_copy(update={"content": PAYLOAD_REF_PREFIX + self.payloads.put(obj.content)})
+        if isinstance(obj, list):
+            return [self._offload(o) for o in obj]
+        if isinstance(obj, tuple):
+            return tuple(self._offload(o) for o in obj)
+        if isinstance(obj, dict):
+            return {k: self._offload(v) for k, v in obj.items()}
+        return obj
+
+    def _restore(self, obj):
+        if isinstance(obj, BaseMessage) and isinstance(obj.content, str) and obj.content.startswith(PAYLOAD_REF_PREFIX):
+            text = self.payloads.get(obj.content[len(PAYLOAD_REF_PREFIX):]) if self.payloads else None
+            if text is not None:
+                obj.content = text
+            return obj
+        if isinstance(obj, list):
+            return [self._restore(o) for o in obj]
+        if isinstance(obj, tuple):
+            return tuple(self._restore(o) for o in obj)
+        if isinstance(obj, dict):
+            return {k: self._restore(v) for k, v in obj.items()}
+        return obj
+
+    # ------------- SerializerProtocol -------------
+    def dumps_typed(self, obj):
+        if not self.compact:
+            return super().dumps_typed(obj)
+        if self.payloads is not None:
+            obj = self._offload(obj)
+        type_, data = super().dumps_typed(obj)
+        if len(data) < COMPRESS_MIN_BYTES or type_ in ("null", "empty"):
+            return type_, data
+        codec, packed = _compress(data)
+        return f"{type_}+{codec}", packed
+
+    def loads_typed(self, data):
+        type_, payload = data
+        if "+" in type_:
+            type_, codec = type_.rsplit("+", 1)
+            payload = _decompress(codec, payload)
+        return self._restore(super().loads_typed((type_, payload)))
+
+@contextmanager
+def open_checkpointer(conn_string: str = DB_URI):
+    """PostgresSaver that reads compacted blobs and writes them when COMPACT_CHECKPOINTS=1"""
+    from langgraph.checkpoint.postgres import PostgresSaver
+    from psycopg.rows import dict_row
+
+    # The payload store only connects on first use, so with the flag off and
+    # nothing offloaded it never opens a connection
+    payloads = PostgresPayloadStore(conn_string)
+    if COMPACT_CHECKPOINTS:
+        payloads.setup()
+    try:
+        with psycopg.connect(conn_string, autocommit=True, prepare_threshold=0, row_factory=dict_row) as conn:
+            yield PostgresSaver(conn, serde=CompactSerializer(payloads, compact=COMPACT_CHECKPOINTS))
+    finally:
+        if payloads.conn is not None:
+            payloads.conn.close()
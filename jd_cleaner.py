@@ -0,0 +1,145 @@
+import hashlib
+import re
+
+# ==============================================================================
+# Job description preprocessing: strip page chrome and boilerplate, dedupe lines
+# and keep the sections that matter for scoring, within a token budget.
+# ==============================================================================
+
+# 500 tokens ~ 2000 chars, the old jd[:2000] cap, so prompts never grow
+JD_TOKEN_BUDGET = 500
+CHARS_PER_TOKEN = 4
+MIN_CUT_CHARS = 40  # below this, a cut line is not worth keeping
+
+# Sections in the order they are kept when the budget runs out
+SECTION_PATTERNS = {
+    "REQUIREMENTS": r"requirements?|what you('ll)? need|must have|you have|skills?( required)?|technical skills|who you are",
+    "QUALIFICATIONS": r"(minimum |preferred |basic )?qualifications?|education|experience( required)?|nice to have|bonus( points)?",
+    "RESPONSIBILITIES": r"responsibilit(y|ies)|what you('ll)? do|the role|role overview|duties|your impact|day to day|key tasks",
+}
+SECTION_ORDER = ["REQUIREMENTS", "QUALIFICATIONS", "RESPONSIBILITIES", "SUMMARY"]
+
+# Qualifier words Indeed headings often lead with: "Key Responsibilities", "Job Requirements"
+HEADING_QUALIFIERS = r"key|job|your|required|minimum|main|core|essential|preferred|basic"
+
+# Headings of sections we drop entirely (benefits, company blurbs, legal text)
+DROP_HEADINGS = r"benefits|perks|what we offer|about (us|the company)|why join|how to apply|equal opportunity|eeo"
+
+BOILERPLATE_PATTERNS = [
+    r"cookie", r"privacy (policy|notice)", r"terms (of|and) (use|service)", r"all rights reserved", r"^©",
+    r"equal (employment )?opportunity", r"without regard to (race|color|religion)", r"\beeo\b", r"affirmative action",
+    r"reasonable accommodation", r"^(sign in|log in|apply now|save job|report job|share|home|jobs|company reviews|find salaries)$",
+    r"^(post your resume|employers|upload your resume|create alert)", r"indeed\.com", r"^\d+ days? ago$", r"^just posted$",
+    r"^(full job description|job details|profile insights|show more|show less)$",
+]
+
+_heading_re = {
+    name: re.compile(rf"^\W*(?:(?:{HEADING_QUALIFIERS})\s+)?({p})\W*$", re.I)
+    for name, p in SECTION_PATTERNS.items()
+}
+_drop_re = re.compile(rf"^\W*({DROP_HEADINGS})\b.{{0,40}}$", re.I)
+_boilerplate_re = re.compile("|".join(BOILERPLATE_PATTERNS), re.I)
+_bullet_re = re.compile(r"^[\-\*•·▪◦●–]+\s*")
+
+def _clean_lines(text: str):
+    seen = set()
+    lines = []
+    for raw in text.splitlines():
+        line = " ".join(_bullet_re.sub("", raw.strip()).split())
+        if len(line) < 3 or _boilerplate_re.search(line):
+            continue
+        key = line.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        lines.append(line)
+    return lines
+
+def _heading_for(line: str):
+    if len(line) > 60:
+        return None
+    if _drop_re.match(line):
+        return "DROP"
+    for name, pattern in _heading_re.items():
+        if pattern.match(line):
+            return name
+    return None
+
+def extract_sections(text: str):
+    """Split a raw description into {section: [lines]}; text before any heading is SUMMARY"""
+    sections = {name: [] for name in SECTION_ORDER}
+    current = "SUMMARY"
+    for line in _clean_lines(text):
+        heading = _heading_for(line)
+        if heading:
+            current = heading
+            continue
+        if current != "DROP":
+            sections[current].append(line)
+    return sections
+
+def normalize_job_description(text: str, token_budget: int = JD_TOKEN_BUDGET):
+    """Compact canonical form of a job description, at most ~token_budget tokens"""
+    sections = extract_sections(text or "")
+    budget = token_budget * CHARS_PER_TOKEN
+    out = []
+    for name in SECTION_ORDER:
+        lines = sections[name]
+        if not lines or budget <= 0:
+            continue
+        # Without real sections the summary is all we have, so give it the budget
+        if name == "SUMMARY" and any(sections[n] for n in SECTION_ORDER[:-1]):
+            lines = lines[:3]
+        block = [f"{name}:"]
+        budget -= len(block[0]) + 1
+        for line in lines:
+            if len(line) + 3 > budget:
+                # Cut an overlong line (e.g. a one-paragraph JD) instead of losing it
+                if budget > MIN_CUT_CHARS:
+                    block.append(f"- {line[:budget - 3].rstrip()}")
+                budget = 0
+                break
+            block.append(f"- {line}")
+            budget -= len(line) + 3
+        if len(block) > 1:
+            out.append("\n".join(block))
+    if not out:
+        # Nothing survived the section rules (e.g. all of it under a dropped heading):
+        # the cleaned text is still better than an unscoreable empty JD
+        return " ".join(_clean_lines(text or ""))[:token_budget * CHARS_PER_TOKEN].strip()
+    return "\n".join(out)
+
+def jd_hash(normalized: str):
+    """Stable hash of a normalized description, for score caching"""
+    return hashlib.sha256(normalized.lower().encode("utf-8")).hexdigest()[:16]
+
+if __name__ == '__main__':
+    # Self-check with real Indeed-style headings: python jd_cleaner.py
+    sample = """
+    Senior Python Developer
+    We are a fast growing fintech.
+    Key Responsibilities:
+    - Build REST APIs with FastAPI
+    - Own the deployment pipeline
+    Job Requirements:
+    - 5+ years of Python
+    Benefits & Perks
+    - Free lunch
+    Required Skills:
+    - PostgreSQL and Docker
+    Your Responsibilities
+    - Mentor junior engineers
+    """
+    sections = extract_sections(sample)
+    assert sections["RESPONSIBILITIES"] == ["Build REST APIs with FastAPI", "Own the deployment pipeline",
+                                            "Mentor junior engineers"], sections
+    assert sections["REQUIREMENTS"] == ["5+ years of Python", "PostgreSQL and Docker"], sections
+    assert "Free lunch" not in normalize_job_description(sample)
+    assert len(normalize_job_description(sample * 50)) <= 2000
+    assert normalize_job_description("Apply now\nSave job") == ""
+    paragraph = "We are looking for a Python engineer with Django experience " * 40
+    assert 0 < len(normalize_job_description(paragraph)) <= 2000
+    long_section = normalize_job_description(f"Requirements\n{paragraph}\n- Python 5 years")
+    assert long_section.startswith("REQUIREMENTS:\n- We are looking") and len(long_section) <= 2000, long_section
+    assert "Free lunch" in normalize_job_description("Benefits\nFree lunch and a gym membership")
+    print("✅ jd_cleaner self-check passed")
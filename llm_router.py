@@ -0,0 +1,236 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+from langchain_groq import ChatGroq
+from langchain_openai import ChatOpenAI
+
+from CONFIG import GROQ_MODEL, OPENAI_MODEL
+from rate_limiter import get_limiter, is_throttle_error
+
+# ==============================================================================
+# LLM routing: primary/fallback providers, hedged requests, health and cost.
+# Providers read their endpoints from the usual env vars (GROQ_API_BASE,
+# OPENAI_BASE_URL), so the router can be pointed at local stub servers.
+# ==============================================================================
+
+load_dotenv()
+
+# Hedge to the next provider once the current one is slower than this percentile
+HEDGE_PERCENTILE = 0.95
+HEDGE_DEFAULT_SECONDS = 8.0
+HEDGE_MIN_SAMPLES = 20
+
+# Circuit breaker: skip a provider for a while after repeated failures
+FAILURES_BEFORE_COOLDOWN = 3
+COOLDOWN_SECONDS = 60
+
+# Rounds over all providers when every one of them is throttled
+ROUTER_RETRIES = 3
+
+# How often the router checks whether a queued request got past the limiter
+ADMIT_POLL_SECONDS = 0.1
+
+# Per provider limits: (requests/second, burst, max concurrency)
+PROVIDER_LIMITS = {
+    "groq": (0.5, 3, 4),
+    "openai": (1.0, 5, 4),
+}
+
+# USD per 1M tokens (input, output) - keep in sync with GROQ_MODEL / OPENAI_MODEL
+PRICING = {
+    "groq": (0.59, 0.79),
+    "openai": (0.15, 0.60),
+}
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-router")
+
+class HedgeCancelled(Exception):
+    """The request lost the race before the limiter admitted it, so it was never sent"""
+
+class Attempt:
+    """One provider request of a routed call: when the limiter admitted it, and whether it is still wanted"""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.admitted_at = None
+        self.cancelled = threading.Event()
+
+class Provider:
+    """Health, latency and cost accounting shared by every router that uses this provider"""
+
+    def __init__(self, name: str, model: str):
+        self.name = name
+        self.model = model
+        rate, burst, concurrency = PROVIDER_LIMITS.get(name, (1.0, 1, 1))
+        self.limiter = get_limiter(f"llm:{model}", rate=rate, capacity=burst, max_concurrency=concurrency)
+        self.pricing = PRICING.get(name, (0.0, 0.0))
+        self.latencies = deque(maxlen=200)
+        self.lock = threading.Lock()
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.stats = {"calls": 0, "errors": 0, "hedged": 0, "wins": 0,
+                      "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+
+    def healthy(self):
+        return time.monotonic() >= self.down_until
+
+    def hedge_delay(self):
+        with self.lock:
+            if len(self.latencies) < HEDGE_MIN_SAMPLES:
+                return HEDGE_DEFAULT_SECONDS
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE))]
+
+    def invoke(self, runnable, messages, attempt=None):
+        attempt = attempt or Attempt(self)
+
+        def admitted():
+            # Runs once the limiter has a slot and a token: only now is the request
+            # sent, so queueing neither counts as latency nor costs anything
+            if attempt.cancelled.is_set():
+                raise HedgeCancelled()
+            attempt.admitted_at = time.monotonic()
+            with self.lock:
+                self.stats["calls"] += 1
+            return runnable.invoke(messages)
+
+        try:
+            # No limiter retries here: the router would rather fail over than wait
+            result = self.limiter.call(admitted, retries=0)
+        except HedgeCancelled:
+            raise
+        except Exception:
+            with self.lock:
+                self.stats["errors"] += 1
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= FAILURES_BEFORE_COOLDOWN:
+                    self.down_until = time.monotonic() + COOLDOWN_SECONDS
+                    print(f"⚠️ LLM provider '{self.name}' unhealthy, cooling down for {COOLDOWN_SECONDS}s")
+            raise
+
+        latency = time.monotonic() - attempt.admitted_at
+        # with_structured_output(include_raw=True) returns {'raw': AIMessage, 'parsed': ...}
+        raw = result.get("raw") if isinstance(result, dict) else result
+        usage = getattr(raw, "usage_metadata", None) or {}
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        with self.lock:
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+            self.down_until = 0.0
+            self.stats["input_tokens"] += input_tokens
+            self.stats["output_tokens"] += output_tokens
+            self.stats["cost_usd"] += (input_tokens * self.pricing[0] + output_tokens * self.pricing[1]) / 1_000_000
+        return result
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+def get_provider(name: str, model: str):
+    with _providers_lock:
+        if name not in _providers:
+            _providers[name] = Provider(name, model)
+        return _providers[name]
+
+def router_stats():
+    """Per provider calls, errors, hedges, wins, tokens, cost and p50/p95 latency"""
+    with _providers_lock:
+        providers = list(_providers.values())
+    stats = {}
+    for p in providers:
+        with p.lock:
+            ordered = sorted(p.latencies)
+            stats[p.name] = dict(p.stats, healthy=p.healthy())
+        if ordered:
+            stats[p.name]["p50_s"] = round(ordered[len(ordered) // 2], 2)
+            stats[p.name]["p95_s"] = round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2)
+    return stats
+
+class LLMRouter:
+    """Drop-in for a chat model's `.invoke`, routed over [(provider, runnable), ...] in priority order"""
+
+    def __init__(self, routes):
+        self.routes = routes
+
+    def bind_tools(self, tools):
+        return LLMRouter([(p, llm.bind_tools(tools)) for p, llm in self.routes])
+
+    def with_structured_output(self, schema, **kwargs):
+        return LLMRouter([(p, llm.with_structured_output(schema, **kwargs)) for p, llm in self.routes])
+
+    def invoke(self, messages):
+        for attempt in range(ROUTER_RETRIES + 1):
+            try:
+                return self._invoke_once(messages)
+            except Exception as e:
+                retryable = is_throttle_error(e) or isinstance(e, (TimeoutError, ConnectionError))
+                if not retryable or attempt == ROUTER_RETRIES:
+                    raise
+                time.sleep(random.uniform(0, min(30.0, 2 ** attempt)))
+
+    def _invoke_once(self, messages):
+        routes = [r for r in self.routes if r[0].healthy()] or self.routes
+        pending = {}
+        errors = []
+        next_i = 0
+
+        def launch():
+            nonlocal next_i
+            provider, runnable = routes[next_i]
+            next_i += 1
+            attempt = Attempt(provider)
+            # Copy the context so graph config/callbacks still reach the model call
+            ctx = contextvars.copy_context()
+            pending[_executor.submit(ctx.run, provider.invoke, runnable, messages, attempt)] = attempt
+            return attempt
+
+        def hedge_timeout(attempt):
+            # The hedge clock starts when the limiter admits the request, not while it queues
+            if next_i >= len(routes):
+                return None
+            if attempt.admitted_at is None:
+                return ADMIT_POLL_SECONDS
+            return max(0.0, attempt.admitted_at + attempt.provider.hedge_delay() - time.monotonic())
+
+        current = launch()
+        try:
+            while pending:
+                done, _ = wait(pending, timeout=hedge_timeout(current), return_when=FIRST_COMPLETED)
+                if not done:
+                    if hedge_timeout(current) == 0.0:
+                        # Current provider is slower than usual: race the next one
+                        with routes[next_i][0].lock:
+                            routes[next_i][0].stats["hedged"] += 1
+                        current = launch()
+                    continue
+                for fut in done:
+                    provider = pending.pop(fut).provider
+                    try:
+                        result = fut.result()
+                    except Exception as e:
+                        print(f"⚠️ LLM provider '{provider.name}' failed: {e}")
+                        errors.append(e)
+                        if next_i < len(routes):
+                            current = launch()
+                        continue
+                    with provider.lock:
+                        provider.stats["wins"] += 1
+                    return result
+            raise errors[-1]
+        finally:
+            # Losers still waiting on their limiter are dropped before they are sent (and paid for)
+            for attempt in pending.values():
+                attempt.cancelled.set()
+
+def build_router(temperature: float, max_tokens: int = None):
+    """Groq first, OpenAI as fallback when OPENAI_API_KEY is set"""
+    routes = [(get_provider("groq", GROQ_MODEL), ChatGroq(model=GROQ_MODEL, temperature=temperature, max_tokens=max_tokens))]
+    if os.getenv("OPENAI_API_KEY"):
+        routes.append((get_provider("openai", OPENAI_MODEL), ChatOpenAI(model=OPENAI_MODEL, temperature=temperature, max_tokens=max_tokens)))
+    return LLMRouter(routes)
@@ -0,0 +1,68 @@
+import re
+import threading
+from collections import Counter
+
+# ==============================================================================
+# Cheap local gate in front of the memory extractor. Only messages that look
+# like they state a durable personal fact (or correct one) go to the LLM;
+# approvals, numbers, bare places and plain requests are skipped, as
+# MEMORY_PROMPT would discard them anyway.
+# ==============================================================================
+
+MIN_WORDS = 3
+
+# Replies to the agent's questions: "yes", "10 jobs", "ok go ahead", "$15"
+SHORT_REPLY_RE = re.compile(
+    r"^\W*(yes|yeah|yep|y|no|nope|n|ok(ay)?|sure|confirm(ed)?|cancel|thanks?( you)?|go( ahead)?|please|"
+    r"\$?\d+([.,]\d+)?\s*(jobs?|usd|dollars?|%)?)(\s+\w+){0,2}\W*$",
+    re.I,
+)
+
+# First-person statements about identity, background, plans and preferences
+FACT_RE = re.compile(
+    r"\b(i am|i'm|im|i was|my (name|background|degree|experience|goal|plan|skills?|resume|cv|field|job|role)|"
+    r"call me|i live|i'm (based|located|from)|i come from|i moved|i work(ed)?|i studied|i graduated|i have \d+|"
+    r"i've (been|worked|studied)|years of experience|i know|i specialize|i want to (move|work|become|relocate|switch)|"
+    r"i plan|i prefer|i'm looking for|i am looking for|i'm learning|i am learning|"
+    # Education and credentials: "I have a masters in CS", "I hold a BS in AI"
+    r"i have an? |i hold|i earned|i completed|i finished|i got my|i'm certified|i am certified|"
+    r"my (masters?|master's|bachelors?|bachelor's|phd|bs|ms|mba|diploma|certifications?|university|education))\b",
+    re.I,
+)
+
+# The user says a stored memory is wrong
+CORRECTION_RE = re.compile(r"\b(forget|that's (wrong|not true|incorrect)|not correct|no longer|i'm not|i am not|remove (that|my))\b", re.I)
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+def should_extract(message) -> tuple[bool, str]:
+    """(send to extractor?, reason) for the user's latest message"""
+    text = message if isinstance(message, str) else str(message)
+    text = text.strip()
+    # Facts first: "I'm Adnan" or "I'm Pakistani" are short but worth remembering
+    if CORRECTION_RE.search(text):
+        decision = (True, "correction")
+    elif FACT_RE.search(text):
+        decision = (True, "personal_fact")
+    elif SHORT_REPLY_RE.match(text):
+        decision = (False, "short_reply")
+    elif len(text.split()) < MIN_WORDS:
+        decision = (False, "too_short")
+    else:
+        decision = (False, "no_personal_fact")
+    _record(*decision)
+    return decision
+
+def _record(extract: bool, reason: str):
+    with _stats_lock:
+        _stats["total"] += 1
+        _stats["extracted" if extract else "skipped"] += 1
+        _stats[f"reason:{reason}"] += 1
+
+def gate_stats():
+    """Counters plus skip rate, e.g. {'total': 40, 'skipped': 31, 'skip_rate': 0.78, 'reason:short_reply': 12, ...}"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["skip_rate"] = round(stats.get("skipped", 0) / stats["total"], 2) if stats.get("total") else 0.0
+    return stats
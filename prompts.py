@@ -61,5 +61,7 @@ If user-specific memory is available:
 
 3. EXECUTE: Once you have the Title, Country, Location, and the Limit, call the `run_headhunter_agent` tool immediately with those exact arguments.
 
-4. PAYMENT PAUSE: Be aware that the system will pause for a final payment confirmation (Human-in-the-Loop) after you call the tool. This is normal.
+4. REPEAT SEARCHES: If the user repeats a search they ran before and only wants postings that are new since then, call `run_headhunter_agent` with only_new=True. Only the new postings found are charged, and previous matches are merged into the report automatically.
+
+5. PAYMENT PAUSE: Be aware that the system will pause for a final payment confirmation (Human-in-the-Loop) after you call the tool. This is normal.
 """
@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# ==============================================================================
+# Shared limiter layer for everything we call from the agent (Indeed pages, LLM
+# models). One AdaptiveLimiter per key: a token bucket paces requests, an AIMD
+# window bounds how many run at once, and throttles are retried with jitter.
+# ==============================================================================
+
+class ThrottledError(Exception):
+    """Raised when a dependency tells us to slow down (HTTP 429, bot wall, ...)"""
+
+def is_throttle_error(e: Exception):
+    if isinstance(e, ThrottledError):
+        return True
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    text = str(e).lower()
+    return "rate limit" in text or "too many requests" in text
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until one token is available"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def drain(self):
+        """Empty the bucket so everyone waits a full refill after a throttle"""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0)
+
+class AdaptiveLimiter:
+    def __init__(self, name: str, rate: float, capacity: float = 1, max_concurrency: int = 1, min_concurrency: int = 1):
+        self.name = name
+        self.bucket = TokenBucket(rate, capacity)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max(max_concurrency, min_concurrency)
+        self.limit = float(min_concurrency)
+        self.in_flight = 0
+        self.cond = threading.Condition()
+        self.stats = {"calls": 0, "success": 0, "throttled": 0, "retries": 0, "failed": 0}
+
+    @contextmanager
+    def slot(self):
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+            self.stats["calls"] += 1
+        try:
+            self.bucket.acquire()
+            yield
+        finally:
+            with self.cond:
+                self.in_flight -= 1
+                self.cond.notify_all()
+
+    def on_success(self):
+        # Additive increase: roughly +1 slot per window of successful calls
+        with self.cond:
+            self.stats["success"] += 1
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self.cond.notify_all()
+
+    def on_throttle(self):
+        # Multiplicative decrease
+        with self.cond:
+            self.stats["throttled"] += 1
+            self.limit = max(self.min_concurrency, self.limit / 2)
+        self.bucket.drain()
+
+    def call(self, fn, retry_on=(), retries: int = 4, base_delay: float = 1.0, max_delay: float = 30.0):
+        """Run fn() under the limiter, retrying throttles and `retry_on` errors with full-jitter backoff"""
+        for attempt in range(retries + 1):
+            try:
+                with self.slot():
+                    result = fn()
+            except Exception as e:
+                throttled = is_throttle_error(e)
+                # Back off even when this was the last attempt (or retries=0), so
+                # callers that fail over instead of retrying still slow everyone down
+                if throttled:
+                    self.on_throttle()
+                if not (throttled or isinstance(e, retry_on)) or attempt == retries:
+                    with self.cond:
+                        self.stats["failed"] += 1
+                    raise
+                with self.cond:
+                    self.stats["retries"] += 1
+                delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+                print(f"⏳ {self.name}: {'throttled' if throttled else e.__class__.__name__}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+            else:
+                self.on_success()
+                return result
+
+# ------------------- Registry -------------------
+
+_limiters = {}
+_registry_lock = threading.Lock()
+
+def get_limiter(name: str, rate: float = 1.0, capacity: float = 1, max_concurrency: int = 1):
+    """Return the process-wide limiter for `name`, creating it on first use"""
+    with _registry_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveLimiter(name, rate, capacity, max_concurrency)
+        return _limiters[name]
+
+def limiter_stats():
+    """Counters per limiter, e.g. {'llm:<model>': {'throttled': 3, 'concurrency': 2.5, ...}}"""
+    with _registry_lock:
+        limiters = list(_limiters.values())
+    stats = {}
+    for limiter in limiters:
+        with limiter.cond:
+            stats[limiter.name] = dict(limiter.stats, concurrency=round(limiter.limit, 2))
+    return stats
@@ -0,0 +1,209 @@
+import hashlib
+import math
+import os
+import re
+import threading
+
+# ==============================================================================
+# Resume registry: each user's resume is parsed once into a compact profile
+# (skills, seniority, locations, prompt summary, vector) keyed by content hash,
+# cached in memory and in the LangGraph store under ('user', user_id, 'resume').
+# ==============================================================================
+
+RESUME_DIR = "resumes"          # resumes/<user_id>.txt, one per user
+DEFAULT_RESUME = "resume.txt"   # single-user setups: used when a user has no resume of their own
+# Multi-user deployments (api_server.py) turn this off so nobody is scored against someone else's resume
+ALLOW_DEFAULT_RESUME = os.getenv("ALLOW_DEFAULT_RESUME", "1") == "1"
+SAFE_USER_ID_RE = re.compile(r"^[A-Za-z0-9_\-][A-Za-z0-9_.\-]{0,127}$")
+RESUME_TOKEN_BUDGET = 450
+CHARS_PER_TOKEN = 4
+VECTOR_DIM = 1024               # at 256, hash collisions alone gave unrelated JDs ~0.2 similarity
+PROFILE_VERSION = 2
+
+# Highest match wins
+SENIORITY_PATTERNS = [
+    ("intern", r"\bintern(ship)?\b|\btrainee\b"),
+    ("junior", r"\bjunior\b|\bjr\.?\b|\bentry[- ]level\b|\bgraduate\b"),
+    ("mid", r"\bmid[- ]level\b|\b[3-4]\+? years\b"),
+    ("senior", r"\bsenior\b|\bsr\.?\b|\b[5-9]\+? years\b|\b1\d\+? years\b"),
+    ("lead", r"\blead\b|\bprincipal\b|\bstaff\b|\bhead of\b|\bmanager\b"),
+]
+LOCATION_RE = re.compile(r"^\W*(location|based in|address|city)\s*[:\-]\s*(.+)$", re.I)
+COUNTRY_NAMES = [
+    "usa", "united states", "canada", "uk", "united kingdom", "ireland", "germany", "france", "netherlands",
+    "uae", "dubai", "saudi arabia", "qatar", "india", "pakistan", "singapore", "malaysia", "australia",
+]
+SKILLS_HEADING_RE = re.compile(r"^\W*(technical )?skills?\b", re.I)
+HEADING_RE = re.compile(r"^[A-Z&/ ]{4,40}$")
+CONTACT_RE = re.compile(r"https?://|www\.|@|github\.com|linkedin\.com|\+?\d[\d\s\-]{7,}\d", re.I)
+TOKEN_RE = re.compile(r"[a-z][a-z0-9+#.]*")
+
+# Function words and generic job-posting vocabulary ("experience", "team",
+# section labels) that every resume and JD share; left in, they dominate the
+# vector and an ICU nursing job looks half similar to an ML resume
+STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being both but by can could did do does
+doing during each for from had has have having he her here him his how i if in into is it its itself
+just me more most my no nor not of off on once only or other our out over own same she should so
+some such than that the their them then there these they this those through to too under until up
+very was we were what when where which while who whom why will with would you your yours
+ability able across based building candidate company day environment etc excellent experience
+good including job join looking new plus preferred related required requirements responsibilities
+qualifications role skills strong summary team using well work working year years
+""".split())
+
+def text_vector(text: str, dim: int = VECTOR_DIM):
+    """Hashed bag-of-words vector without stopwords (L2 normalized), cheap enough to compute per job"""
+    vec = [0.0] * dim
+    for token in TOKEN_RE.findall(text.lower()):
+        token = token.rstrip(".")
+        if len(token) < 2 or token in STOPWORDS:
+            continue
+        digest = hashlib.md5(token.encode("utf-8")).digest()
+        vec[int.from_bytes(digest[:4], "little") % dim] += 1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [round(v / norm, 4) for v in vec]
+
+def cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+def _extract_skills(lines):
+    skills = []
+    in_skills = False
+    for line in lines:
+        if SKILLS_HEADING_RE.match(line):
+            in_skills = True
+            continue
+        if in_skills and HEADING_RE.match(line):
+            break
+        if in_skills:
+            items = line.split(":", 1)[-1]
+            for item in re.split(r",|;|\|", items):
+                item = re.sub(r"\s*\(([^)]*)\)", "", item).strip(" *-•.")
+                if item:
+                    skills.append(item)
+    return list(dict.fromkeys(skills))
+
+def _extract_seniority(lines):
+    # Only titles and short lines; bullets mention things like "lead generation"
+    text = "\n".join(l for l in lines if len(l) < 80 and not l.startswith(("*", "-", "•")))
+    level = "unknown"
+    for name, pattern in SENIORITY_PATTERNS:
+        if re.search(pattern, text, re.I):
+            level = name
+    return level
+
+def _extract_locations(lines):
+    locations = [m.group(2).strip() for m in map(LOCATION_RE.match, lines) if m]
+    header = " ".join(lines[:5]).lower()
+    locations += [c for c in COUNTRY_NAMES if re.search(rf"\b{re.escape(c)}\b", header)]
+    return list(dict.fromkeys(locations))
+
+def _build_summary(lines, skills, seniority, locations):
+    """Compact prompt form: headline, seniority, skills, then experience bullets up to the budget"""
+    budget = RESUME_TOKEN_BUDGET * CHARS_PER_TOKEN
+    out = [f"SENIORITY: {seniority}", f"SKILLS: {', '.join(skills)}"]
+    if locations:
+        out.append(f"LOCATIONS: {', '.join(locations)}")
+    headline = [l for l in lines[:3] if not CONTACT_RE.search(l)]
+    out = headline[:2] + out
+    budget -= sum(len(l) + 1 for l in out)
+    skill_lines = set()
+    in_skills = False
+    for line in lines:
+        if SKILLS_HEADING_RE.match(line):
+            in_skills = True
+        elif HEADING_RE.match(line):
+            in_skills = False
+        if in_skills:
+            skill_lines.add(line)
+    for line in lines[3:]:
+        if line in skill_lines or CONTACT_RE.search(line):
+            continue
+        if len(line) + 1 > budget:
+            break
+        out.append(line)
+        budget -= len(line) + 1
+    return "\n".join(out)
+
+def build_profile(text: str):
+    lines = [" ".join(l.split()) for l in text.splitlines() if l.strip()]
+    skills = _extract_skills(lines)
+    seniority = _extract_seniority(lines)
+    locations = _extract_locations(lines)
+    return {
+        "version": PROFILE_VERSION,
+        "hash": hashlib.sha256(text.encode("utf-8")).hexdigest()[:16],
+        "skills": skills,
+        "seniority": seniority,
+        "locations": locations,
+        "summary": _build_summary(lines, skills, seniority, locations),
+        "vector": text_vector(text),
+    }
+
+def prefilter(profile, jd: str):
+    """(similarity, matched skills) between a profile and a normalized job description"""
+    jd_lower = jd.lower()
+    matched = [s for s in profile["skills"] if re.search(rf"(?<!\w){re.escape(s.lower())}(?!\w)", jd_lower)]
+    return cosine(profile["vector"], text_vector(jd)), matched
+
+# ------------------- Registry -------------------
+
+_profiles = {}  # user_id -> (path, mtime, profile)
+_profiles_lock = threading.Lock()
+
+def resume_path(user_id: str):
+    # The id may come straight from a request header: no separators, no "..", no hidden files
+    if not SAFE_USER_ID_RE.match(str(user_id)) or ".." in str(user_id):
+        return None
+    path = os.path.join(RESUME_DIR, f"{user_id}.txt")
+    if os.path.exists(path):
+        return path
+    if ALLOW_DEFAULT_RESUME and os.path.exists(DEFAULT_RESUME):
+        return DEFAULT_RESUME
+    return None
+
+def get_resume_profile(user_id: str, store=None):
+    """Profile for a user's resume; re-read only when the file changes, re-parsed only when its content does"""
+    path = resume_path(user_id)
+    if path is None:
+        return None
+    mtime = os.stat(path).st_mtime
+    with _profiles_lock:
+        cached = _profiles.get(user_id)
+    if cached and cached[0] == path and cached[1] == mtime:
+        return cached[2]
+
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+    profile = None
+    namespace = ('user', user_id, 'resume')
+    if store is not None:
+        item = store.get(namespace, 'profile')
+        if item and item.value.get('hash') == content_hash and item.value.get('version') == PROFILE_VERSION:
+            profile = item.value
+    if profile is None:
+        profile = build_profile(text)
+        if store is not None:
+            store.put(namespace, 'profile', profile)
+
+    with _profiles_lock:
+        _profiles[user_id] = (path, mtime, profile)
+    return profile
+
+if __name__ == '__main__':
+    # Self-check of the pre-filter and id handling: python resume_profile.py
+    profile = build_profile(open(DEFAULT_RESUME, encoding="utf-8").read())
+    nursing_jd = ("REQUIREMENTS:\n- Valid RN license and BLS/ACLS certification\n- 2+ years of experience in a hospital setting\n"
+                  "RESPONSIBILITIES:\n- Provide direct patient care in the intensive care unit\n- Administer medications and monitor vital signs")
+    ml_jd = ("REQUIREMENTS:\n- Strong Python and experience with LLMs, RAG and vector databases\n"
+             "- Experience building agents with LangChain or LangGraph\nRESPONSIBILITIES:\n- Build and deploy AI systems to production")
+    nursing_similarity, nursing_matched = prefilter(profile, nursing_jd)
+    ml_similarity, _ = prefilter(profile, ml_jd)
+    assert nursing_similarity < 0.1 and not nursing_matched, (nursing_similarity, nursing_matched)
+    assert ml_similarity > 0.3, ml_similarity
+    for bad_id in ("../etc/passwd", "..", "a/b", ".hidden", ""):
+        assert resume_path(bad_id) is None, bad_id
+    print(f"✅ resume_profile self-check passed (nursing {nursing_similarity:.2f}, ML {ml_similarity:.2f})")
@@ -0,0 +1,239 @@
+import argparse
+import time
+
+import psycopg
+
+from compact_serde import ensure_payload_table, payload_refs
+from db import DB_URI
+
+# ==============================================================================
+# Checkpoint retention: keep the last N checkpoints per thread, drop threads
+# idle for D days and collect offloaded payloads nothing references any more.
+# Threads are paged by keyset on thread_id, and each page is handled in its own
+# short transaction, so one run is a single pass that can go next to live traffic.
+#
+#   python retention.py --keep-last 20 --idle-days 30
+# ==============================================================================
+
+KEEP_LAST_CHECKPOINTS = 20
+IDLE_THREAD_DAYS = 30
+BATCH_THREADS = 50
+PAUSE_SECONDS = 0.2
+# Unreferenced payloads are kept this long after their last use, which must stay
+# well above compact_serde.PAYLOAD_TOUCH_SECONDS
+PAYLOAD_GRACE_DAYS = 1
+PAYLOAD_BATCH = 500
+
+TABLES = ["checkpoints", "checkpoint_blobs", "checkpoint_writes", "checkpoint_payloads"]
+CHECKPOINT_TS = "(checkpoint->>'ts')::timestamptz"
+
+def _new_stats():
+    return {"threads_dropped": 0, "checkpoints": 0, "checkpoint_blobs": 0, "checkpoint_writes": 0,
+            "checkpoint_payloads": 0, "bytes": 0}
+
+def _table_sizes(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT relname, pg_total_relation_size(oid) FROM pg_class WHERE relname = ANY(%s)", (TABLES,))
+        return dict(cur.fetchall())
+
+def _add(stats, table, rows):
+    stats[table] += len(rows)
+    stats["bytes"] += sum(r[-1] or 0 for r in rows)
+
+def _delete_orphan_blobs(cur, thread_ids, stats):
+    # A blob is live while any remaining checkpoint of its thread references its
+    # (channel, version). New blobs commit together with the checkpoint that
+    # references them, so this single statement never sees one without the other.
+    cur.execute("""
+        DELETE FROM checkpoint_blobs b
+        WHERE b.thread_id = ANY(%s)
+        AND NOT EXISTS (
+            SELECT 1 FROM checkpoints c
+            WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+            AND c.checkpoint->'channel_versions'->>b.channel = b.version
+        )
+        RETURNING octet_length(b.blob)
+    """, (thread_ids,))
+    _add(stats, "checkpoint_blobs", cur.fetchall())
+
+def _thread_pages(conn, batch):
+    """Thread ids in pages of `batch`, by keyset on the primary key index (no full-table GROUP BY)"""
+    last = ""
+    while True:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT DISTINCT thread_id FROM checkpoints
+                WHERE thread_id > %s
+                ORDER BY thread_id
+                LIMIT %s
+            """, (last, batch))
+            thread_ids = [r[0] for r in cur.fetchall()]
+        if not thread_ids:
+            return
+        yield thread_ids
+        last = thread_ids[-1]
+
+def drop_idle_threads(conn, idle_days, stats, batch=BATCH_THREADS, pause=PAUSE_SECONDS):
+    """Delete every row of threads whose newest checkpoint is older than idle_days"""
+    for page in _thread_pages(conn, batch):
+        with conn.transaction(), conn.cursor() as cur:
+            # Only this page's checkpoints are read (and detoasted) for their timestamps
+            cur.execute(f"""
+                SELECT thread_id FROM checkpoints
+                WHERE thread_id = ANY(%s)
+                GROUP BY thread_id
+                HAVING MAX({CHECKPOINT_TS}) < now() - make_interval(days => %s)
+            """, (page, idle_days))
+            candidates = [r[0] for r in cur.fetchall()]
+            if not candidates:
+                continue
+            # The user may come back between the SELECT above and these statements
+            # (READ COMMITTED), so the idle condition is checked again when deleting
+            # checkpoints, and writes/blobs only go once no checkpoint of the thread is left
+            cur.execute("""
+                DELETE FROM checkpoints c
+                WHERE c.thread_id = ANY(%s)
+                AND NOT EXISTS (
+                    SELECT 1 FROM checkpoints n
+                    WHERE n.thread_id = c.thread_id
+                    AND (n.checkpoint->>'ts')::timestamptz >= now() - make_interval(days => %s)
+                )
+                RETURNING c.thread_id, pg_column_size(c.checkpoint) + pg_column_size(c.metadata)
+            """, (candidates, idle_days))
+            deleted = cur.fetchall()
+            _add(stats, "checkpoints", deleted)
+            thread_ids = list({r[0] for r in deleted})
+            if not thread_ids:
+                continue
+            for table in ("checkpoint_writes", "checkpoint_blobs"):
+                cur.execute(f"""
+                    DELETE FROM {table} t
+                    WHERE t.thread_id = ANY(%s)
+                    AND NOT EXISTS (SELECT 1 FROM checkpoints c WHERE c.thread_id = t.thread_id)
+                    RETURNING octet_length(t.blob)
+                """, (thread_ids,))
+                _add(stats, table, cur.fetchall())
+            stats["threads_dropped"] += len(thread_ids)
+        print(f"🗑️  Dropped {len(thread_ids)} idle thread(s)")
+        time.sleep(pause)
+
+def prune_old_checkpoints(conn, keep_last, stats, batch=BATCH_THREADS, pause=PAUSE_SECONDS):
+    """Keep the newest keep_last checkpoints per (thread, namespace), with their writes and blobs"""
+    for page in _thread_pages(conn, batch):
+        with conn.transaction(), conn.cursor() as cur:
+            cur.execute("""
+                WITH ranked AS (
+                    SELECT thread_id, checkpoint_ns, checkpoint_id,
+                           row_number() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rn
+                    FROM checkpoints WHERE thread_id = ANY(%s)
+                )
+                DELETE FROM checkpoints c USING ranked r
+                WHERE r.rn > %s
+                AND c.thread_id = r.thread_id AND c.checkpoint_ns = r.checkpoint_ns AND c.checkpoint_id = r.checkpoint_id
+                RETURNING c.thread_id, c.checkpoint_ns, c.checkpoint_id,
+                          pg_column_size(c.checkpoint) + pg_column_size(c.metadata)
+            """, (page, keep_last))
+            deleted = cur.fetchall()
+            if not deleted:
+                continue
+            _add(stats, "checkpoints", deleted)
+            thread_ids = list({r[0] for r in deleted})
+            cur.execute("""
+                DELETE FROM checkpoint_writes w
+                USING unnest(%s::text[], %s::text[], %s::text[]) AS d(thread_id, checkpoint_ns, checkpoint_id)
+                WHERE w.thread_id = d.thread_id AND w.checkpoint_ns = d.checkpoint_ns AND w.checkpoint_id = d.checkpoint_id
+                RETURNING octet_length(w.blob)
+            """, ([r[0] for r in deleted], [r[1] for r in deleted], [r[2] for r in deleted]))
+            _add(stats, "checkpoint_writes", cur.fetchall())
+            _delete_orphan_blobs(cur, thread_ids, stats)
+        print(f"✂️  Pruned {len(deleted)} checkpoint(s) across {len(thread_ids)} thread(s)")
+        time.sleep(pause)
+
+def collect_payloads(conn, grace_days, stats, batch=PAYLOAD_BATCH, pause=PAUSE_SECONDS):
+    """
+    Delete offloaded payloads (compact_serde) that no remaining blob or write
+    references and that have not been used for grace_days. Runs after pruning,
+    so payloads of dropped checkpoints are collected in the same run.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('checkpoint_payloads')")
+        if cur.fetchone()[0] is None:
+            return
+    ensure_payload_table(conn)
+
+    # Mark: stream every stored blob once through server-side cursors
+    live = set()
+    for table in ("checkpoint_blobs", "checkpoint_writes"):
+        with conn.transaction(), conn.cursor(name=f"retention_{table}") as cur:
+            cur.itersize = 500
+            cur.execute(f"SELECT type, blob FROM {table} WHERE blob IS NOT NULL")
+            for type_, blob in cur:
+                live |= payload_refs(type_, bytes(blob))
+
+    # Sweep: the grace period covers payloads referenced after the mark started,
+    # since every put() bumps last_used_at at least once per PAYLOAD_TOUCH_SECONDS
+    while True:
+        with conn.transaction(), conn.cursor() as cur:
+            cur.execute("""
+                DELETE FROM checkpoint_payloads WHERE hash IN (
+                    SELECT hash FROM checkpoint_payloads
+                    WHERE last_used_at < now() - make_interval(days => %s)
+                    AND NOT (hash = ANY(%s::text[]))
+                    LIMIT %s
+                )
+                RETURNING octet_length(data)
+            """, (grace_days, list(live), batch))
+            deleted = cur.fetchall()
+            _add(stats, "checkpoint_payloads", deleted)
+        if not deleted:
+            return
+        print(f"🧹 Collected {len(deleted)} unreferenced payload(s)")
+        time.sleep(pause)
+
+def run_retention(keep_last=KEEP_LAST_CHECKPOINTS, idle_days=IDLE_THREAD_DAYS, batch=BATCH_THREADS,
+                  pause=PAUSE_SECONDS, vacuum=False, payload_grace_days=PAYLOAD_GRACE_DAYS):
+    """Apply the retention policy and return what was removed (rows per table, payload bytes, table sizes)"""
+    stats = _new_stats()
+    # Autocommit, so each conn.transaction() below is its own short BEGIN/COMMIT
+    with psycopg.connect(DB_URI, autocommit=True) as conn:
+        before = _table_sizes(conn)
+        if idle_days:
+            drop_idle_threads(conn, idle_days, stats, batch, pause)
+        if keep_last:
+            prune_old_checkpoints(conn, keep_last, stats, batch, pause)
+        if payload_grace_days:
+            collect_payloads(conn, payload_grace_days, stats, pause=pause)
+        if vacuum:
+            # Plain VACUUM (no FULL): marks space reusable without locking out writers
+            for table in TABLES:
+                if table in before:
+                    conn.execute(f"VACUUM (ANALYZE) {table}")
+        stats["size_before"] = before
+        stats["size_after"] = _table_sizes(conn)
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prune old checkpoints and idle threads in small batches")
+    parser.add_argument("--keep-last", type=int, default=KEEP_LAST_CHECKPOINTS, help="checkpoints kept per thread (0 = keep all)")
+    parser.add_argument("--idle-days", type=int, default=IDLE_THREAD_DAYS, help="drop threads idle this long (0 = never)")
+    parser.add_argument("--batch", type=int, default=BATCH_THREADS, help="threads per transaction")
+    parser.add_argument("--pause", type=float, default=PAUSE_SECONDS, help="seconds between batches")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM (ANALYZE) the tables afterwards")
+    parser.add_argument("--payload-grace-days", type=int, default=PAYLOAD_GRACE_DAYS,
+                        help="collect unreferenced payloads unused this long (0 = never)")
+    args = parser.parse_args(argv)
+
+    stats = run_retention(args.keep_last, args.idle_days, args.batch, args.pause, args.vacuum, args.payload_grace_days)
+    print(f"\n✅ Removed {stats['checkpoints']} checkpoints, {stats['checkpoint_blobs']} blobs, "
+          f"{stats['checkpoint_writes']} writes, {stats['checkpoint_payloads']} payloads; "
+          f"dropped {stats['threads_dropped']} idle threads")
+    print(f"💾 Reclaimed ~{stats['bytes'] / 1024 / 1024:.2f} MB of row payload")
+    for table in TABLES:
+        if table not in stats["size_before"]:
+            continue
+        before = stats["size_before"].get(table, 0) / 1024 / 1024
+        after = stats["size_after"].get(table, 0) / 1024 / 1024
+        print(f"   └─ {table}: {before:.2f} MB -> {after:.2f} MB on disk")
+
+if __name__ == '__main__':
+    main()
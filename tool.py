@@ -2,16 +2,26 @@ import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
 import time
-from langchain_groq import ChatGroq
+import threading
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.messages import HumanMessage
 from langchain_core.tools import tool
+from pydantic import BaseModel, Field
+from typing import List
 from dotenv import load_dotenv
-import re
 import os
+import re
+import hashlib
 from langgraph.types import interrupt
-from langchain_openai import ChatOpenAI
-from CONFIG import GROQ_MODEL, OPENAI_MODEL
+from langgraph.config import get_config, get_store
+from rate_limiter import ThrottledError, get_limiter, limiter_stats
+from llm_router import build_router, router_stats
+from jd_cleaner import normalize_job_description, jd_hash
+from resume_profile import get_resume_profile, prefilter
 
 # Load API Keys
 load_dotenv()
@@ -19,23 +29,54 @@ load_dotenv()
 # Config
 MATCH_THRESHOLD = 50
 MAX_PAGES_TO_SCRAPE = 5 
+APPROVE_WORDS = ['yes', 'y', 'confirm', 'ok']
+
+# Unfinished search progress older than this is dropped: a later run of the same
+# query is charged and scraped again instead of resuming stale results
+PROGRESS_TTL_SECONDS = 2 * 60 * 60
+
+# Rate limit (requests/second) for Indeed and scoring parallelism; LLM limits live in llm_router.py
+INDEED_RATE_PER_SEC = 0.5
+MAX_SCORING_WORKERS = 4
+
+# Structured scoring output is capped so the model can't write essays
+SCORING_MAX_TOKENS = 150
+MAX_LISTED_SKILLS = 5
+
+# Jobs below this resume similarity with no skill overlap are not sent to the LLM.
+# Unrelated JDs land below 0.1 against resume.txt, related ones above 0.4 (python resume_profile.py)
+PREFILTER_MIN_SIMILARITY = 0.15
+
+# Scores kept in memory per process (LRU), so long-running servers stay bounded
+SCORE_CACHE_SIZE = 2048
+
+# One report per user and thread: reports/<user_id>/<thread_id>.txt
+REPORTS_DIR = "reports"
+
+# Bot-wall detection. Titles must match exactly: results and postings carry the
+# search query or job title ("Security Check Officer") in their page title
+BLOCK_TITLES = {
+    "just a moment...", "just a moment", "attention required! | cloudflare", "access denied",
+    "security check - indeed.com", "hcaptcha", "blocked - indeed.com",
+}
+BLOCK_SELECTORS = (
+    "#challenge-form, #challenge-running, #challenge-stage, #cf-challenge-running, "
+    "iframe[src*='challenges.cloudflare.com'], iframe[src*='captcha'], div.g-recaptcha, div.h-captcha"
+)
 
 # ------------------- Helper Functions -------------------
 
-def _read_my_resume():
-    try:
-        with open("resume.txt", "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        return None
+class job_score(BaseModel):
+    score: int = Field(description="match score from 0 to 100")
+    matched_skills: List[str] = Field(default_factory=list, description="at most 5 resume skills the job asks for")
+    missing_skills: List[str] = Field(default_factory=list, description="at most 5 required skills the resume lacks")
+    reason: str = Field(description="one short sentence, max 20 words")
 
-def _extract_score(text):
-    match = re.search(r"SCORE:\s*(\d+)%", text)
-    if not match:
-        match = re.search(r"(\d+)%", text)
-    if match:
-        return int(match.group(1))
-    return 0
+def _format_score(result: job_score):
+    """Compact report text for a structured score"""
+    return (f"{result.reason}\n"
+            f"MATCHED: {', '.join(result.matched_skills[:MAX_LISTED_SKILLS]) or '-'}\n"
+            f"MISSING: {', '.join(result.missing_skills[:MAX_LISTED_SKILLS]) or '-'}")
 
 def _get_smart_domain(country_input: str):
     c = country_input.lower().strip()
@@ -137,120 +178,370 @@ def _scrape_jobs_from_page(driver, base_url):
         except: continue
     return list(dict.fromkeys(job_links))
 
-def _go_to_next_page(driver):
+# ------------------- Search Progress -------------------
+# Progress lives in the LangGraph store under ('user', user_id, 'search_progress'),
+# one item per query, so a crashed or retried search picks up where it stopped.
+# Finished searches are folded into ('user', user_id, 'search_history') so a
+# repeated query can skip postings it has already evaluated.
+
+def _search_key(job_title: str, country: str, location: str):
+    raw = "|".join(s.lower().strip() for s in (job_title, country, location))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def _user_id():
+    return get_config().get('configurable', {}).get('user_id', 'anonymous')
+
+def _user_namespace(kind: str):
+    return ('user', _user_id(), kind)
+
+def _safe_path_part(value: str):
+    """Ids come from request headers, so keep them to one harmless path component"""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(value)).lstrip(".") or "_"
+
+def _report_path():
+    """good_jobs report of the current user and thread, so concurrent searches don't share a file"""
+    configurable = get_config().get('configurable', {})
+    thread_id = configurable.get('thread_id', 'default')
+    return os.path.join(REPORTS_DIR, _safe_path_part(_user_id()), f"{_safe_path_part(thread_id)}.txt")
+
+def _job_id(link: str):
+    """Indeed's `jk` id for a posting, falling back to the link itself"""
+    if "jk=" in link:
+        return link.split("jk=")[1].split("&")[0]
+    return link
+
+def _get_progress_store():
+    try:
+        return get_store()
+    except Exception:
+        return None
+
+def _load_progress(store, namespace, key, job_limit, only_new):
+    """Return the unfinished progress for this query, or None to start fresh"""
+    if store is None:
+        return None
+    item = store.get(namespace, key)
+    if not item:
+        return None
+    if time.time() - item.value.get('updated_at', 0) > PROGRESS_TTL_SECONDS:
+        store.delete(namespace, key)
+        return None
+    if item.value.get('job_limit') == job_limit and item.value.get('only_new', False) == only_new:
+        return item.value
+    return None
+
+def _load_history(store, namespace, key):
+    """Return {'seen': {jk: score}, 'matches': [...]} for a previously run query"""
+    item = store.get(namespace, key) if store is not None else None
+    if item:
+        return item.value
+    return {'seen': {}, 'matches': []}
+
+def _record_history(store, namespace, key, history, progress):
+    """Merge a finished run into the saved search so the next delta run skips it"""
+    if store is None:
+        return
+    matches = {m['link']: m for m in history['matches']}
+    for link, result in progress['done'].items():
+        history['seen'][_job_id(link)] = result['score']
+        if result['score'] >= MATCH_THRESHOLD:
+            matches[link] = {'link': link, 'score': result['score'], 'response': result['response']}
+    history['matches'] = list(matches.values())
+    store.put(namespace, key, history)
+
+def _save_progress(store, namespace, key, progress):
+    if store is not None:
+        progress['updated_at'] = time.time()
+        store.put(namespace, key, progress)
+
+def _clear_progress(store, namespace, key):
+    if store is not None:
+        store.delete(namespace, key)
+
+def _write_report_header(report_path, job_title, location, progress, previous_matches):
+    """Start the report, replaying matches already scored by an earlier attempt or search"""
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write(f"=== REPORT: {job_title} in {location} ===\n\n")
+        if previous_matches:
+            f.write(f"=== PREVIOUS MATCHES ({len(previous_matches)}) ===\n\n")
+            for m in previous_matches:
+                f.write(f"LINK: {m['link']}\nSCORE: {m['score']}%\nAI: {m['response']}\n{'-'*50}\n")
+            f.write("\n=== NEW MATCHES ===\n\n")
+        for link, result in progress['done'].items():
+            if result['score'] >= MATCH_THRESHOLD:
+                f.write(f"LINK: {link}\nSCORE: {result['score']}%\nAI: {result['response']}\n{'-'*50}\n")
+
+def _new_progress(job_title, country, location, job_limit, only_new, links):
+    return {
+        'job_title': job_title, 'country': country, 'location': location,
+        'job_limit': job_limit, 'only_new': only_new, 'approved': False, 'links': links, 'done': {},
+    }
+
+def _harvest_links(driver, base_url, job_title, location, page_limiter, job_limit, seen, only_new):
+    """Up to job_limit posting links in page order, skipping postings whose `jk` is in seen"""
+    url = f"{base_url}/jobs?q={job_title.replace(' ', '+')}&l={location.replace(' ', '+')}"
+    print("⏳ Waiting for Page Load...")
+    page_limiter.call(lambda: _open_results_page(driver, url), retry_on=(WebDriverException,))
+
+    # Delta runs stop as soon as `job_limit` unseen postings are found
+    target = job_limit if only_new else job_limit * 2
+    job_links = []
+    for _ in range(MAX_PAGES_TO_SCRAPE):
+        links = _scrape_jobs_from_page(driver, base_url)
+        job_links.extend(l for l in links if _job_id(l) not in seen)
+        job_links = list(dict.fromkeys(job_links))
+        if len(job_links) >= target: break 
+        next_url = _next_page_url(driver)
+        if not next_url: break
+        # Paced and block-checked like every other Indeed page; a retry reloads the URL
+        page_limiter.call(lambda: _open_results_page(driver, next_url), retry_on=(WebDriverException,))
+
+    # Keep page order and limit
+    return job_links[:job_limit]
+
+def _next_page_url(driver):
     selectors = [
         (By.CSS_SELECTOR, "a[data-testid='pagination-page-next']"),
         (By.XPATH, "//a[@aria-label='Next Page']")
     ]
     for by, selector in selectors:
         try:
-            btn = driver.find_element(by, selector)
-            btn.click()
-            time.sleep(3)
-            return True
+            href = driver.find_element(by, selector).get_attribute("href")
+            if href: return href
         except: continue
-    return False
+    return None
 
-# ------------------- Main Agent Tool -------------------
+def _raise_if_blocked(driver):
+    title = " ".join((driver.title or "").lower().split())
+    if title in BLOCK_TITLES or driver.find_elements(By.CSS_SELECTOR, BLOCK_SELECTORS):
+        raise ThrottledError(f"Indeed blocked the browser ({driver.title})")
 
-@tool
-def run_headhunter_agent(job_title: str, country: str, location: str, job_limit: int):
-    """
-    Runs the autonomous job search. 
-    """
-    if not all([job_title, country, location]):
-        return "❌ Error: Missing arguments."
+def _wait_for_job_cards(driver, timeout=15):
+    try:
+        WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "h2.jobTitle a, a.jcs-JobTitle, a[data-jk]"))
+        )
+    except TimeoutException:
+        pass
 
-    # --- 1. PAYMENT GATE ---
-    cost = job_limit * 1.5
-    user_decision = interrupt(f"Approve charge of ${cost} for {job_limit} jobs?")
+def _open_results_page(driver, url):
+    # The bot wall usually shows up on the results pages, so check before waiting
+    driver.get(url)
+    _raise_if_blocked(driver)
+    # 🛑 FIX: NO INPUT(). Wait (up to 15s) for the result cards instead.
+    _wait_for_job_cards(driver)
 
-    if str(user_decision).lower() not in ['yes', 'y', 'confirm', 'ok']:
-        return "❌ Search Cancelled by User."
+def _fetch_description(driver, link):
+    driver.get(link)
+    _raise_if_blocked(driver)
+    try:
+        return WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.ID, "jobDescriptionText"))
+        ).text
+    except TimeoutException:
+        return driver.find_element(By.TAG_NAME, "body").text
 
-    # --- 2. START AUTOMATION ---
-    my_resume = _read_my_resume()
-    if not my_resume: return "❌ Error: 'resume.txt' not found."
+# (resume hash, jd hash) -> (score, response); reposted jobs are not scored twice
+_score_cache = OrderedDict()
+_score_cache_lock = threading.Lock()
 
-    llm = ChatGroq(model=GROQ_MODEL, temperature=0)
-    
+def _cache_score(cache_key, value):
+    with _score_cache_lock:
+        _score_cache[cache_key] = value
+        _score_cache.move_to_end(cache_key)
+        while len(_score_cache) > SCORE_CACHE_SIZE:
+            _score_cache.popitem(last=False)
+    return value
+
+def _score_job(llm, profile, jd):
+    """Score a normalized job description against the resume profile, reusing cached scores"""
+    cache_key = (profile['hash'], jd_hash(jd))
+    with _score_cache_lock:
+        if cache_key in _score_cache:
+            _score_cache.move_to_end(cache_key)
+            return _score_cache[cache_key]
+    similarity, matched = prefilter(profile, jd)
+    if similarity < PREFILTER_MIN_SIMILARITY and not matched:
+        return 0, f"Skipped by pre-filter (similarity {similarity:.2f}, no matching skills)"
+    prompt = (f"RESUME: {profile['summary']}\nJOB: {jd}\n"
+              f"Score how well the resume matches the job (0-100). Be terse: list at most "
+              f"{MAX_LISTED_SKILLS} matched and missing skills and give a one-line reason.")
+    output = llm.invoke([HumanMessage(content=prompt)])
+    result = output['parsed']
+    if result is None:
+        # Leave the job unfinished so a retry scores it again
+        raise ValueError(f"Unparseable score: {output['parsing_error']}")
+    score = max(0, min(100, result.score))
+    return _cache_score(cache_key, (score, _format_score(result)))
+
+def _start_driver():
     options = uc.ChromeOptions()
     # options.add_argument('--headless=new') # Uncomment for Server Deployment
     
     # 🛑 ROBUST DRIVER FIX: Auto-detect first, force v143 if that fails
     try:
-        driver = uc.Chrome(options=options, use_subprocess=True)
+        return uc.Chrome(options=options, use_subprocess=True)
     except Exception as e:
         print(f"⚠️ Auto-version failed. Forcing Chrome v143. Error: {e}")
-        driver = uc.Chrome(options=options, use_subprocess=True, version_main=143)
+        return uc.Chrome(options=options, use_subprocess=True, version_main=143)
+
+# ------------------- Main Agent Tool -------------------
+
+@tool
+def run_headhunter_agent(job_title: str, country: str, location: str, job_limit: int, only_new: bool = False):
+    """
+    Runs the autonomous job search. 
+    Set only_new=True to repeat a saved search and only process postings not evaluated before.
+    """
+    if not all([job_title, country, location]):
+        return "❌ Error: Missing arguments."
+
+    store = _get_progress_store()
+    namespace = _user_namespace('search_progress')
+    history_namespace = _user_namespace('search_history')
+    key = _search_key(job_title, country, location)
+    progress = _load_progress(store, namespace, key, job_limit, only_new)
+    history = _load_history(store, history_namespace, key)
+    seen = history['seen'] if only_new else {}
+    previous_matches = [m for m in history['matches'] if only_new]
+
+    domain = _get_smart_domain(country)
+    base_url = f"https://{domain}"
+    page_limiter = get_limiter(f"indeed:{domain}", rate=INDEED_RATE_PER_SEC)
+
+    # --- 1. DELTA HARVEST ---
+    # Delta runs collect the unseen postings before the payment gate, so the user is
+    # charged for what was actually found. The links are saved, so resuming after
+    # the interrupt (which re-runs this tool) doesn't scrape them again.
+    if only_new and not (progress and progress['links']):
+        driver = _start_driver()
+        try:
+            links = _harvest_links(driver, base_url, job_title, location, page_limiter, job_limit, seen, only_new)
+        except Exception as e:
+            return f"❌ Error: {str(e)}"
+        finally:
+            driver.quit()
+        if not links:
+            _clear_progress(store, namespace, key)
+            _write_report_header(_report_path(), job_title, location, {'done': {}}, previous_matches)
+            return f"✅ No new postings since your last search. {len(previous_matches)} previous matches are in the report."
+        progress = _new_progress(job_title, country, location, job_limit, only_new, links)
+        _save_progress(store, namespace, key, progress)
+
+    # --- 2. PAYMENT GATE ---
+    # An approved search that was interrupted (crash, restart, retry) is not charged again.
+    if not (progress and progress.get('approved')):
+        job_count = len(progress['links']) if only_new else job_limit
+        cost = job_count * 1.5
+        user_decision = interrupt(f"Approve charge of ${cost} for {job_count} jobs?")
+
+        if str(user_decision).lower() not in APPROVE_WORDS:
+            _clear_progress(store, namespace, key)
+            return "❌ Search Cancelled by User."
+
+        progress = progress or _new_progress(job_title, country, location, job_limit, only_new, [])
+        progress['approved'] = True
+        _save_progress(store, namespace, key, progress)
+    else:
+        print(f"♻️ Resuming search: {len(progress['done'])}/{len(progress['links']) or job_limit} jobs already scored")
+
+    # Matches of an earlier attempt at this same run are already in progress['done']
+    previous_matches = [m for m in previous_matches if m['link'] not in progress['done']]
+
+    # --- 3. START AUTOMATION ---
+    profile = get_resume_profile(_user_id(), store)
+    if not profile: return "❌ Error: no resume found for this user (resumes/<user_id>.txt)."
+
+    report_path = _report_path()
+    llm = build_router(temperature=0, max_tokens=SCORING_MAX_TOKENS).with_structured_output(job_score, include_raw=True)
+    driver = None
+    failed = []
 
     try:
-        domain = _get_smart_domain(country)
-        base_url = f"https://{domain}"
-        url = f"{base_url}/jobs?q={job_title.replace(' ', '+')}&l={location.replace(' ', '+')}"
-        
-        driver.get(url)
-        
-        # 🛑 FIX: NO INPUT(). JUST WAIT.
-        print("⏳ Waiting 15 seconds for Page Load...")
-        time.sleep(15) 
-        
-        all_job_links = []
-        for _ in range(MAX_PAGES_TO_SCRAPE):
-            links = _scrape_jobs_from_page(driver, base_url)
-            all_job_links.extend(links)
-            if len(all_job_links) >= job_limit * 2: break 
-            if not _go_to_next_page(driver): break
-        
-        # Deduplicate and limit
-        all_job_links = list(set(all_job_links))[:job_limit]
-        
+        all_job_links = progress['links']
+
+        if not all_job_links or len(progress['done']) < len(all_job_links):
+            driver = _start_driver()
+
         if not all_job_links:
-            return "❌ No jobs found. Indeed might have blocked the browser."
+            all_job_links = _harvest_links(driver, base_url, job_title, location, page_limiter, job_limit, seen, only_new)
+            if not all_job_links:
+                return "❌ No jobs found. Indeed might have blocked the browser."
 
-        # Analyze
-        good_matches = 0
-        with open("good_jobs.txt", "w", encoding="utf-8") as f:
-            f.write(f"=== REPORT: {job_title} in {location} ===\n\n")
+            progress['links'] = all_job_links
+            _save_progress(store, namespace, key, progress)
 
-        results_summary = []
+        # Analyze: pages load one at a time in the browser, scoring runs in parallel
+        _write_report_header(report_path, job_title, location, progress, previous_matches)
+        lock = threading.Lock()
 
-        for link in all_job_links:
+        def _on_scored(link, future):
             try:
-                driver.get(link)
-                time.sleep(2)
-                
-                # Try finding description
-                try:
-                    jd = driver.find_element(By.ID, "jobDescriptionText").text
-                except:
-                    jd = driver.find_element(By.TAG_NAME, "body").text
-
-                prompt = f"RESUME: {my_resume[:2000]}\nJOB: {jd[:2000]}\nGive me a 0-100% match score. Format: SCORE: X%"
-                response = llm.invoke([HumanMessage(content=prompt)]).content
-                score = _extract_score(response)
-                
-                # Store all results
+                score, response = future.result()
+            except Exception as e:
+                print(f"⚠️ Scoring failed for {link}: {e}")
+                failed.append(link)
+                return
+            with lock:
                 if score >= MATCH_THRESHOLD:
-                    good_matches += 1
-                    with open("good_jobs.txt", "a", encoding="utf-8") as f:
+                    with open(report_path, "a", encoding="utf-8") as f:
                         f.write(f"LINK: {link}\nSCORE: {score}%\nAI: {response}\n{'-'*50}\n")
-                    results_summary.append(f"✅ Match ({score}%): {link}")
-                    
-            except: continue
+
+                # Checkpoint after every job so a restart skips it
+                progress['done'][link] = {'score': score, 'response': response if score >= MATCH_THRESHOLD else ''}
+                _save_progress(store, namespace, key, progress)
+
+        with ThreadPoolExecutor(max_workers=MAX_SCORING_WORKERS) as pool:
+            for link in all_job_links:
+                if link in progress['done']:
+                    continue
+                try:
+                    raw_jd = page_limiter.call(lambda: _fetch_description(driver, link), retry_on=(WebDriverException,))
+                except Exception as e:
+                    print(f"⚠️ Could not load {link}: {e}")
+                    failed.append(link)
+                    continue
+                # Boilerplate stripped and requirements first, within JD_TOKEN_BUDGET
+                jd = normalize_job_description(raw_jd)
+                if not jd:
+                    # Nothing left after cleaning (empty or blocked page): retry it later, never score it
+                    print(f"⚠️ Empty job description for {link}")
+                    failed.append(link)
+                    continue
+                future = pool.submit(_score_job, llm, profile, jd)
+                future.add_done_callback(functools.partial(_on_scored, link))
 
     except Exception as e:
         return f"❌ Error: {str(e)}"
     finally:
-        driver.quit()
+        if driver is not None:
+            driver.quit()
+        # Every scored posting goes into the saved search right away, even when other
+        # links failed, so a later only_new run never charges for it again
+        _record_history(store, history_namespace, key, history, progress)
+        print(f"📊 Rate limiter stats: {limiter_stats()}")
+        print(f"📊 LLM router stats: {router_stats()}")
 
-    return f"✅ Done! Found {good_matches} matches. \n" + "\n".join(results_summary)
+    # Links that failed stay unfinished, so a retry only redoes those
+    if len(progress['done']) >= len(all_job_links):
+        _clear_progress(store, namespace, key)
+
+    new_matches = [
+        f"✅ Match ({result['score']}%): {link}"
+        for link, result in progress['done'].items() if result['score'] >= MATCH_THRESHOLD
+    ]
+    results_summary = new_matches + [f"☑️ Previous match ({m['score']}%): {m['link']}" for m in previous_matches]
+    if failed:
+        results_summary.append(f"⚠️ {len(failed)} jobs could not be processed. Run the same search again to retry them at no extra charge.")
+    return f"✅ Done! Found {len(new_matches)} new matches. \n" + "\n".join(results_summary)
 
 @tool
 def read_good_jobs_report():
-    """Reads the 'good_jobs.txt' file."""
-    if os.path.exists("good_jobs.txt"):
+    """Reads the good jobs report of the latest search in this conversation."""
+    report_path = _report_path()
+    if os.path.exists(report_path):
         # 🛑 FIX: Added encoding="utf-8" to prevent Windows crash
-        with open("good_jobs.txt", "r", encoding="utf-8") as f: 
+        with open(report_path, "r", encoding="utf-8") as f: 
             return f.read()
     return "No report found."
\ No newline at end of file